@@ -1,223 +1,995 @@
-#!/usr/bin/env python3
-
-#
-# 915gm/910gml memory timings parser
-# https:#github.com/rustyJ4ck/EeePC701
-#
-# 1) Enable mchbar -> CALL D:\bin\mchbar-enable.bat
-# 2) RW allows only one instance, so close it before running this script 
-# Usage: py mchbar_timings.py --with-read  # read timings from actual hardware registers using RW.exe
-# Usage: py mchbar_timings.py --simple 0x110=0x88BC10D8 0x114=0x03508111 ... # or 114=03408110 to decode timings
-#
-
-# DDR2-400 CL3-3-3-9 defaults:
-#  C0DRT0  Address: 0x110 	Value: 0x987820C8 
-#  C0DRT1  Address: 0x114 	Value: 0x0290D211 
-#  C0DRT2  Address: 0x118 	Value: 0x80000230 
-#  C0DRC0  Address: 0x120 	Value: 0x40000A06 
- 
-import subprocess
-import sys
-import re
-
-def format_bool(v):
-    return 'Y' if v else 'N'
-
-class RegisterParser:
-    def __init__(self, options):
-        self.mchbar = 0xFED14000
-        self.rwCmd = r'D:\bin\RwPortableV1.7\Rw.exe /Min /Nologo /Stdout /Command='
-        
-        self._readTimings = '--with-read' in options
-        self._simplePrint = '--simple' in options
-        
-        self.registers = []
-        self.spd = {}
-        self._regValues = {}
-        
-        self.getRegValuesFromOpts(options)
-    
-    def addRegister(self, name, address, value, bitFields):
-        register_value = value
-        if self._readTimings:
-            register_value = self.readAddr(address)
-        
-        self.registers.append({
-            'name': name,
-            'address': address,
-            'value': register_value,
-            'bitFields': bitFields
-        })
-    
-    def parseAndPrint(self):
-        for register in self.registers:
-            reg_id = register['address']
-            if reg_id in self._regValues:
-                register['value'] = self._regValues[reg_id]
-            self.printRegister(register)
-            print()
-    
-    def getRegValuesFromOpts(self, options):
-        for opt in options:
-            match = re.match(r'(?P<reg>[\d]{3})=(?:0x)?(?P<value>[\dA-Z]+)', opt, re.IGNORECASE)
-            if match:
-                reg_id = '0x' + match.group('reg')
-                self._regValues[reg_id] = '0x' + match.group('value')
-    
-    def printRegister(self, reg):
-        value = int(reg['value'], 16)
-        
-        print("=== {} ===".format(reg['name']), end=' ')
-        print("Address: {}".format(reg['address']), end=' ')
-        print("Value: {}".format(reg['value']), end=' ')
-        binary_str = bin(value)[2:].zfill(32)
-        spaced_binary = ' '.join(binary_str[i:i+4] for i in range(0, 32, 4))
-        print(spaced_binary)
-        
-        print()
-        
-        for field in reg['bitFields']:
-            fieldValue = self.extractBitField(value, field['bits'])
-            
-            field_id = field.get('id', '')
-            field_format = field.get('format')
-            description = field['description']
-            field_range = field.get('range', '')
-            
-            formatted_value = fieldValue
-            if field_format:
-                if callable(field_format):
-                    formatted_value = field_format(fieldValue)
-                else:
-                    formatted_value = field_format
-            
-            if self._simplePrint:
-                id_display = "{} ".format(field_id) if field_id else ""
-                print("  {:5} {:<4} {}".format(
-                    id_display,
-                    formatted_value,
-                    description
-                ))
-            else:
-                id_display = "{} ".format(field_id) if field_id else ""
-                range_str = "{}..{}".format(field_range[0], field_range[1]) if field_range else ""
-                
-                if field_format:
-                    value_display = "{})  {}".format(fieldValue, formatted_value)
-                else:
-                    value_display = formatted_value
-                
-                print("  Bits {:<7} {:<5} {:<47} {:>10} | 0x{:02X} | {:<6b} {}".format(
-                    field['bits'],
-                    id_display,
-                    description,
-                    value_display,
-                    fieldValue,
-                    fieldValue,
-                    range_str
-                ))
-            
-            if field_id:
-                self.spd[field_id] = formatted_value
-    
-    def extractBitField(self, value, bitsSpec):
-        v = value
-        vb32 = bin(v)[2:].zfill(32)
-        
-        if ':' in bitsSpec:
-            parts = bitsSpec.split(':')
-            end = int(parts[0])
-            beg = int(parts[1])
-        else:
-            end = int(bitsSpec)
-            beg = int(bitsSpec)
-        
-        start_pos = 32 - end - 1
-        length = 1 + end - beg
-        vb = vb32[start_pos:start_pos + length]
-        return int(vb, 2)
-    
-    def readAddr(self, address):
-        cmd = self.rwCmd + '"r32 0x{:X}"'.format(self.mchbar + int(address, 16))
-        print(cmd)
-        try:
-            result = subprocess.check_output(cmd, shell=True, universal_newlines=True)
-            rwResult = result.split('=')
-            return rwResult[1].strip() if len(rwResult) > 1 else False
-        except subprocess.CalledProcessError:
-            return False
-
-def main():
-    parser = RegisterParser(sys.argv)
-    
-    parser.addRegister("C0DRT0", "0x110", "0x987820C8", [
-        {'bits': '31:28', 'id': 'WTP',  'description': 'Write To Precharge Command Spacing (Same bank)',     'range': [5,13], 'min': 'CL - 1 + BL/2 + WR'},
-        {'bits': '27:24', 'id': 'WTR2', 'description': 'Write To Read Command Spacing (Same rank)',      'range': [4,11], 'min': 'CL - 1 + BL/2 + WTR'},
-        {'bits': '23:22', 'id': 'WRD',  'description': 'Write-Read Command Spacing (Different Rank)',    'format': lambda v: 6-v, 'min': 'BL/2 + TA -1'},
-        {'bits': '21:20', 'id': 'RTW',  'description': 'Read-Write Command Spacing',                    'format': lambda v: 9-v, 'min': 'BL/2 + TA +1'},
-        {'bits': '19:18', 'id': 'CCDw', 'description': 'Write Command Spacing',                         'format': lambda v: 6-v, 'min': 'BL/2 + TA'},
-        {'bits': '16',    'id': 'CCDr', 'description': 'Read Command Spacing',                          'format': lambda v: 5 if v else 6, 'range': [5,6]},
-        {'bits': '15:11', 'id': 'RD',   'description': 'Read Delay',                                   'range': [3,31]},
-        {'bits': '8:4',   'id': 'WTP2', 'description': 'Write Auto precharge to Activate (Same bank)', 'range': [4,19], 'min': 'CL -1 + BL/2 + WR + RP'},
-        {'bits': '3:0',   'id': 'RTP',  'description': 'Read Auto precharge to Activate (Same bank)',  'min': 'RTPC + RP'}
-    ])
-    
-    parser.addRegister("C0DRT1", "0x114", "0x0290D211", [
-        {'bits': '29:28', 'id': 'RTPC', 'description': 'Read to Pre-charge BL/2', 'format': lambda v: {0:4,1:8}[v]},
-        {'bits': '23:20', 'id': 'RAS',  'description': 'Active to Precharge Delay'},
-        {'bits': '17',    'id': 'RRD',  'description': 'Activate to activate delay (clk)', 'format': lambda v: {0:2,1:3}[v]},
-        {'bits': '16',                  'description': 'tRPALL Pre-All to Activate Delay'},
-        {'bits': '15:11', 'id': 'RFC',  'description': 'Refresh Cycle Time', 'range': [3,31]},
-        {'bits': '9:8',   'id': 'CL',   'description': 'CAS Latency', 'format': lambda v: {0:5,1:4,2:3}[v]},
-        {'bits': '6:4',   'id': 'RCD',  'description': 'RAS to CAS Delay', 'format': lambda v: 1+{0:1,1:2,2:3,3:4,4:5}[v]},
-        {'bits': '2:0',   'id': 'RP',   'description': 'Precharge to Activate Delay', 'format': lambda v: 1+{0:1,1:2,2:3,3:4,4:5}[v]}
-    ])
-    
-    parser.addRegister("C0DRT2", "0x118", "0x80000230", [
-        {'bits': '31:30', 'description': 'CKE Deassert Duration', 'format': lambda v: {0:1,1:'N/A',2:3,3:'N/A'}[v]},
-        {'bits': '9:8',   'description': 'Power Down Exit to CS# active time', 'id': 'XPDN', 'range': [1,2], 'format': lambda v: {0:'N/A',1:1,2:2,3:1}[v]},
-        {'bits': '7:5',   'description': 'DRAM Page Close Idle Timer', 'format': lambda v: {0:'N/A',1:8,2:16,3:'!res',7:'Inf'}[v]},
-        {'bits': '4:0',   'description': 'DRAM Power down Idle Timer', 'format': lambda v: 'Inf' if v==31 else v, 'range': [8,16]}
-    ])
-    
-    parser.addRegister("C0DRC0", "0x120", "0x40000906", [
-        {'bits': '29',    'id': 'IC',   'description': 'Initialization Complete', 'format': format_bool},
-        {'bits': '27:24',               'description': 'Active SDRAM Ranks'},
-        {'bits': '15',                  'description': 'CMD copy enable (Single channel only)'},
-        {'bits': '10:8',  'id': 'RMS',  'description': 'Refresh Mode Select (RMS)', 'format': lambda v: {0:'N',1:'15.6',2:'7.8'}.get(v, '')},
-        {'bits': '6:4',   'id': 'SMD',  'description': 'Mode Select'},
-        {'bits': '2',     'id': 'BL',   'description': 'Burst Length', 'format': lambda v: 8 if v else 4},
-        {'bits': '1:0',   'id': 'DT',   'description': 'DRAM Type'}
-    ])
-    
-    print("EEEPC 701/900 DDR2 timings parser\n")
-    parser.parseAndPrint()
-    
-    parser.spd['WTR'] = 2
-    parser.spd['WR'] = 3
-    parser.spd['RC'] = parser.spd['RAS'] + parser.spd['RP']
-    
-    print("-------------------------------------------------------------------------------------")
-    print("@ 200 MHz\t{}-{}-{}-{:<2}  (CL-RCD-RP-RAS) / {:<2}-{}-{}-{}-{}-{}  (RC-RFC-RRD-WR-WTR-RTP) \n".format(
-        parser.spd['CL'],
-        parser.spd['RCD'],
-        parser.spd['RP'],
-        parser.spd['RAS'],
-        parser.spd['RC'],
-        parser.spd['RFC'],
-        parser.spd['RRD'],
-        parser.spd['WR'],
-        parser.spd['WTR'],
-        parser.spd['RTP']
-    ))
-    
-    print("SPD Memory Timings")
-    print("HYMP125S64CP8-S6")
-    print("@ 400 MHz\t6-6-6-18  (CL-RCD-RP-RAS) / 24-51-3-6-3-3  (RC-RFC-RRD-WR-WTR-RTP)")
-    print("@ 333 MHz\t5-5-5-15  (CL-RCD-RP-RAS) / 20-43-3-5-3-3  (RC-RFC-RRD-WR-WTR-RTP)")
-    print("@ 266 MHz\t4-4-4-12  (CL-RCD-RP-RAS) / 16-34-2-4-2-2  (RC-RFC-RRD-WR-WTR-RTP)")
-    print("HYMP125S64CP8-Y5")
-    print("@ 200 MHz\t3-3-3-9   (CL-RCD-RP-RAS) / 12-26-2-3-2-2  (RC-RFC-RRD-WR-WTR-RTP)")
-
-if __name__ == "__main__":
+#!/usr/bin/env python3
+
+#
+# 915gm/910gml memory timings parser
+# https:#github.com/rustyJ4ck/EeePC701
+#
+# 1) Enable mchbar -> CALL D:\bin\mchbar-enable.bat
+# 2) RW allows only one instance, so close it before running this script 
+# Usage: py mchbar_timings.py --with-read  # read timings from actual hardware registers using RW.exe
+# Usage: py mchbar_timings.py --simple 0x110=0x88BC10D8 0x114=0x03508111 ... # or 114=03408110 to decode timings
+#
+# Usage: py mchbar_timings.py --with-read --access=devmem  # Linux, as root: one mmap of MCHBAR via /dev/mem (default off Windows)
+# Usage: py mchbar_timings.py 110=87FD1064 114=02609A11 --save-fake=fake.bin  # file standing in for the MCHBAR window
+# Usage: py mchbar_timings.py --with-read --access=fake.bin  # read the fake device instead of hardware
+#
+# Usage: py mchbar_timings.py --watch --interval=0.0005  # print decoded field changes only (e.g. firmware/SMM rewrites)
+# Usage: py mchbar_timings.py --watch=0x200,0x20C --access=fake.bin --duration=60  # extra registers, raw word diffs
+#
+# Usage: py mchbar_timings.py --encode CL=3 RCD=3 RP=3 RAS=6 RFC=19  # timings -> register words + constraint check
+# Usage: py mchbar_timings.py --search CL=3 BL=8 [WR=3 WTR=2 TA=0]  # every valid setting with the tightest dependent timings
+# Usage: py mchbar_timings.py --check 110=87FD1064 114=02609A11  # decode and check against the range/min formulas
+#
+# Usage: py mchbar_timings.py --batch fleet.csv snapshots.jsonl ..\CL3\timings-*.txt > decoded.jsonl
+# Usage: py mchbar_timings.py --batch --csv fleet.csv > decoded.csv  # one row per snapshot, summary timings + fields
+#
+# Captured snapshots in bulk: parser.decodeBatch('C0DRT1', values) decodes a whole array of
+# register values at once (NumPy-vectorized if installed, pure Python otherwise)
+#
+
+# DDR2-400 CL3-3-3-9 defaults:
+#  C0DRT0  Address: 0x110 	Value: 0x987820C8 
+#  C0DRT1  Address: 0x114 	Value: 0x0290D211 
+#  C0DRT2  Address: 0x118 	Value: 0x80000230 
+#  C0DRC0  Address: 0x120 	Value: 0x40000A06 
+ 
+import subprocess
+import sys
+import os
+import re
+import mmap
+import struct
+import csv
+import json
+import itertools
+import time
+from datetime import datetime
+try:
+    import numpy
+except ImportError:  # No NumPy, batches are decoded in pure Python
+    numpy = None
+
+def format_bool(v):
+    return 'Y' if v else 'N'
+
+# MCHBAR window of the 915GM/910GML memory controller
+MCHBAR = 0xFED14000
+MCHBAR_SIZE = 0x4000
+RW_CMD = r'D:\bin\RwPortableV1.7\Rw.exe /Min /Nologo /Stdout /Command='
+
+_bitSpecs = {}
+
+def compile_bits(bitsSpec):
+    """
+    Shift and mask of a bit field spec, '31:28' (high:low) or '16'
+
+    Specs are parsed once and cached, decoding is then (value >> shift) & mask.
+
+    Returns:
+        tuple: (shift, mask)
+    """
+    compiled = _bitSpecs.get(bitsSpec)
+    if compiled is None:
+        end, _, beg = bitsSpec.partition(':')
+        end = int(end)
+        beg = int(beg) if beg else end
+        compiled = _bitSpecs[bitsSpec] = (beg, (1 << (end - beg + 1)) - 1)
+    return compiled
+
+# Summary line order, as printed at the end of the decoded dump
+SUMMARY = ['CL', 'RCD', 'RP', 'RAS', 'RC', 'RFC', 'RRD', 'WR', 'WTR', 'RTP']
+
+# Register header printed by this script: "=== C0DRT0 === Address: 0x110 Value: 0x987820C8"
+DUMP_REGISTER_RE = re.compile(r'=== (\w+) === Address: (0x[\dA-F]+) Value: (0x[\dA-F]+)', re.IGNORECASE)
+# Rw.exe r32 result, as collected by dump_timings.bat: "... 0xFED14110 = 0x987820C8"
+RW_RESULT_RE = re.compile(r'0xFED14([\dA-F]{3})\s*=\s*(0x[\dA-F]+)', re.IGNORECASE)
+
+# Inputs of the 'min' formulas that are not register fields, in clocks: write
+# recovery and write-to-read (fixed as in spd_summary()), rank turnaround
+FORMULA_DEFAULTS = {'WR': 3, 'WTR': 2, 'TA': 0}
+MIN_TERM_RE = re.compile(r'([+-]?)([^+-]+)')
+# Register value on the command line: "114=03408110", "0x110=0x88BC10D8"
+REG_VALUE_RE = re.compile(r'(?:0x)?(?P<reg>[\d]{3})=(?:0x)?(?P<value>[\dA-Z]+)', re.IGNORECASE)
+# Timing target on the command line: "CL=3", "RAS=6"
+TARGET_RE = re.compile(r'([A-Za-z]\w*)=(\d+)$')
+
+def eval_min(formula, values):
+    """
+    Evaluate a field's 'min' formula, e.g. 'CL - 1 + BL/2 + WR'
+    
+    Only + - and / occur, so the minimum never shrinks when an input grows.
+    
+    Args:
+        values: Timings by name, formatted field values plus FORMULA_DEFAULTS
+    """
+    total = 0
+    for sign, term in MIN_TERM_RE.findall(formula.replace(' ', '')):
+        parts = [int(part) if part.isdigit() else values[part] for part in term.split('/')]
+        value = parts[0]
+        for divisor in parts[1:]:
+            value /= divisor
+        total += -value if sign == '-' else value
+    return int(total) if total == int(total) else total
+
+def spd_summary(spd):
+    """
+    Fill in the derived timings of decoded fields: WTR and WR (not in the
+    registers, fixed at 2 and 3 clocks) and RC = RAS + RP
+    
+    Returns:
+        dict: spd, with '?' for RC when RAS or RP didn't decode
+    """
+    spd['WTR'] = 2
+    spd['WR'] = 3
+    try:
+        spd['RC'] = spd['RAS'] + spd['RP']
+    except (KeyError, TypeError):
+        spd['RC'] = '?'
+    return spd
+
+def format_field(field, fieldValue):
+    """Field value through the field's 'format', '?' for values the format doesn't know (reserved encodings)"""
+    field_format = field.get('format')
+    if not field_format:
+        return fieldValue
+    if not callable(field_format):
+        return field_format
+    try:
+        return field_format(fieldValue)
+    except (KeyError, IndexError):
+        return '?'
+
+def read_snapshots(path):
+    """
+    Stream register snapshots from a file
+    
+    - .csv: one snapshot per row, register columns named by address (0x110 or 110)
+      or name (C0DRT0), other columns (host, date...) are passed through
+    - .jsonl / .json: one JSON object per line, keys as in CSV
+    - anything else: text dumps of this script (timings-stock.txt, timings-opt2.txt)
+      or Rw.exe r32 output; a register seen twice starts the next snapshot
+    
+    Yields:
+        tuple: (source "file:line", {register or other column: value})
+    """
+    lower = path.lower()
+    with open(path, newline='') as f:
+        if lower.endswith('.csv'):
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield '{}:{}'.format(path, reader.line_num), row
+        elif lower.endswith(('.jsonl', '.json')):
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    yield '{}:{}'.format(path, line_no), json.loads(line)
+        else:
+            values = {}
+            first = None
+            for line_no, line in enumerate(f, 1):
+                match = DUMP_REGISTER_RE.search(line)
+                if match:
+                    key, value = match.group(2), match.group(3)
+                else:
+                    match = RW_RESULT_RE.search(line)
+                    if not match:
+                        continue
+                    key, value = '0x' + match.group(1), match.group(2)
+                key = key.lower()
+                if key in values:
+                    yield '{}:{}'.format(path, first), values
+                    values = {}
+                if not values:
+                    first = line_no
+                values[key] = value
+            if values:
+                yield '{}:{}'.format(path, first), values
+
+def write_rows(rows, asCsv=False, out=None):
+    """
+    Write decoded rows as JSON lines, or as CSV with the first row's columns
+    
+    Returns:
+        int: Rows written
+    """
+    out = out or sys.stdout
+    count = 0
+    writer = None
+    try:
+        for row in rows:
+            if asCsv:
+                if writer is None:
+                    writer = csv.DictWriter(out, fieldnames=list(row), extrasaction='ignore', lineterminator='\n')
+                    writer.writeheader()
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(row) + '\n')
+            count += 1
+        out.flush()
+    except BrokenPipeError:
+        # Reader went away (| head): stop quietly, and keep the exit flush from failing again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+    return count
+
+class FieldTable:
+    """
+    Bit fields of one register compiled to shift/mask tables
+
+    decode() takes one 32-bit value, decodeBatch() whole arrays of captured
+    values: vectorized with NumPy when it is installed, list comprehensions
+    otherwise. Both return raw field values, before 'format'.
+    """
+    def __init__(self, bitFields):
+        self.bitFields = bitFields
+        self.columns = [field.get('id') or field['bits'] for field in bitFields]
+        self.pairs = [compile_bits(field['bits']) for field in bitFields]
+        if numpy is not None:
+            self._shifts = numpy.array([shift for shift, _ in self.pairs], dtype=numpy.uint32)[:, None]
+            self._masks = numpy.array([mask for _, mask in self.pairs], dtype=numpy.uint32)[:, None]
+    
+    def decode(self, value):
+        """Raw field values of one register value, in bitFields order"""
+        return [(value >> shift) & mask for shift, mask in self.pairs]
+    
+    def decodeBatch(self, values):
+        """
+        Decode many register values at once
+        
+        Args:
+            values: Register values as ints (list, any iterable or NumPy array)
+        
+        Returns:
+            One row per field (bitFields order), one column per value: a 2D
+            uint32 NumPy array, or a list of lists without NumPy
+        """
+        if numpy is not None:
+            values = numpy.asarray(values if hasattr(values, '__len__') else list(values), dtype=numpy.uint32)
+            return (values[None, :] >> self._shifts) & self._masks
+        values = values if isinstance(values, list) else list(values)
+        return [[(value >> shift) & mask for value in values] for shift, mask in self.pairs]
+
+class RwExeAccess:
+    """Register reads through RW Everything (Windows), one Rw.exe process per register"""
+    def __init__(self, rwCmd=RW_CMD, base=MCHBAR):
+        self.rwCmd = rwCmd
+        self.base = base
+    
+    def read32(self, offset):
+        cmd = self.rwCmd + '"r32 0x{:X}"'.format(self.base + offset)
+        print(cmd)
+        try:
+            result = subprocess.check_output(cmd, shell=True, universal_newlines=True)
+            return int(result.split('=')[1].strip(), 16)
+        except (subprocess.CalledProcessError, IndexError, ValueError) as e:
+            raise OSError('r32 0x{:X} failed: {}'.format(self.base + offset, e))
+    
+    def close(self):
+        pass
+
+class MmapAccess:
+    """
+    Register reads from a single memory mapping of the MCHBAR window
+    
+    /dev/mem maps the physical window (Linux, root, MCHBAR enabled, and a
+    kernel that allows it: CONFIG_STRICT_DEVMEM=n or iomem=relaxed). Any
+    other file is a fake device, byte 0 standing for the window start, see
+    save_fake_device(); it has to reach past the last register in REGISTERS.
+    Reads are aligned 32-bit loads from the mapping, an offset outside the
+    mapping raises OSError.
+    """
+    def __init__(self, path='/dev/mem', base=MCHBAR, size=MCHBAR_SIZE):
+        self.path = path
+        fd = os.open(path, os.O_RDONLY | getattr(os, 'O_SYNC', 0))
+        try:
+            if path != '/dev/mem':
+                base = 0
+                size = min(size, os.fstat(fd).st_size)
+                needed = max(int(address, 16) for _, address, _, _ in REGISTERS) + 4
+                if size < needed:
+                    raise OSError('{} is {} bytes, a fake device needs at least {} (register 0x{:X})'.format(
+                        path, size, needed, needed - 4))
+            self._map = mmap.mmap(fd, size - size % 4, access=mmap.ACCESS_READ, offset=base)
+        finally:
+            os.close(fd)
+        self._words = memoryview(self._map).cast('I')
+    
+    def read32(self, offset):
+        if offset % 4:
+            raise ValueError('Unaligned register offset 0x{:X}'.format(offset))
+        if not 0 <= offset < len(self._words) * 4:
+            raise OSError('Register offset 0x{:X} outside the {} byte window of {}'.format(
+                offset, len(self._words) * 4, self.path))
+        return self._words[offset >> 2]
+    
+    def close(self):
+        self._words.release()
+        self._map.close()
+
+def open_access(spec, rwCmd=RW_CMD, base=MCHBAR):
+    """
+    Register access backend for an --access value
+    
+    Args:
+        spec: 'rw' (Rw.exe), 'devmem' (/dev/mem mmap) or the path of a fake device file
+        rwCmd: Rw.exe command prefix (default: RW_CMD)
+        base: Physical MCHBAR address (default: MCHBAR)
+    """
+    if spec == 'rw':
+        return RwExeAccess(rwCmd, base)
+    if spec == 'devmem':
+        return MmapAccess('/dev/mem', base)
+    return MmapAccess(spec)
+
+def save_fake_device(path, values, size=MCHBAR_SIZE):
+    """
+    Write a fake MCHBAR window for MmapAccess: zeros, with values at their offsets
+    
+    Args:
+        values: {offset: 32-bit value}
+    """
+    window = bytearray(size)
+    for offset, value in values.items():
+        struct.pack_into('=I', window, offset, value)
+    with open(path, 'wb') as f:
+        f.write(window)
+
+class RegisterParser:
+    def __init__(self, options):
+        self.mchbar = MCHBAR
+        self.rwCmd = RW_CMD
+        
+        self._readTimings = '--with-read' in options
+        self._simplePrint = '--simple' in options
+        
+        self.registers = []
+        self.spd = {}
+        self._regValues = {}
+        
+        # Register access backend, opened on the first read
+        self.accessSpec = 'rw' if os.name == 'nt' else 'devmem'
+        for opt in options:
+            if opt.startswith('--access='):
+                self.accessSpec = opt.split('=', 1)[1]
+        self.access = None
+        
+        self.getRegValuesFromOpts(options)
+    
+    def addRegister(self, name, address, value, bitFields):
+        register_value = value
+        if self._readTimings:
+            register_value = self.readAddr(address)
+        
+        self.registers.append({
+            'name': name,
+            'address': address,
+            'value': register_value,
+            'bitFields': bitFields,
+            'table': FieldTable(bitFields)
+        })
+    
+    def parseAndPrint(self):
+        for register in self.registers:
+            reg_id = register['address']
+            if reg_id in self._regValues:
+                register['value'] = self._regValues[reg_id]
+            self.printRegister(register)
+            print()
+    
+    def getRegValuesFromOpts(self, options):
+        for opt in options:
+            match = REG_VALUE_RE.match(opt)
+            if match:
+                reg_id = '0x' + match.group('reg')
+                self._regValues[reg_id] = '0x' + match.group('value')
+    
+    def printRegister(self, reg):
+        value = int(reg['value'], 16)
+        
+        print("=== {} ===".format(reg['name']), end=' ')
+        print("Address: {}".format(reg['address']), end=' ')
+        print("Value: {}".format(reg['value']), end=' ')
+        binary_str = bin(value)[2:].zfill(32)
+        spaced_binary = ' '.join(binary_str[i:i+4] for i in range(0, 32, 4))
+        print(spaced_binary)
+        
+        print()
+        
+        table = reg.get('table') or FieldTable(reg['bitFields'])
+        for field, fieldValue in zip(reg['bitFields'], table.decode(value)):
+            
+            field_id = field.get('id', '')
+            field_format = field.get('format')
+            description = field['description']
+            field_range = field.get('range', '')
+            
+            formatted_value = fieldValue
+            if field_format:
+                if callable(field_format):
+                    formatted_value = field_format(fieldValue)
+                else:
+                    formatted_value = field_format
+            
+            if self._simplePrint:
+                id_display = "{} ".format(field_id) if field_id else ""
+                print("  {:5} {:<4} {}".format(
+                    id_display,
+                    formatted_value,
+                    description
+                ))
+            else:
+                id_display = "{} ".format(field_id) if field_id else ""
+                range_str = "{}..{}".format(field_range[0], field_range[1]) if field_range else ""
+                
+                if field_format:
+                    value_display = "{})  {}".format(fieldValue, formatted_value)
+                else:
+                    value_display = formatted_value
+                
+                print("  Bits {:<7} {:<5} {:<47} {:>10} | 0x{:02X} | {:<6b} {}".format(
+                    field['bits'],
+                    id_display,
+                    description,
+                    value_display,
+                    fieldValue,
+                    fieldValue,
+                    range_str
+                ))
+            
+            if field_id:
+                self.spd[field_id] = formatted_value
+    
+    def extractBitField(self, value, bitsSpec):
+        shift, mask = compile_bits(bitsSpec)
+        return (value >> shift) & mask
+    
+    def decodeBatch(self, register, values):
+        """
+        Raw field values of many captured values of one register
+        
+        Args:
+            register: Register name or address, e.g. 'C0DRT1' or '0x114'
+            values: Register values as ints, see FieldTable.decodeBatch()
+        
+        Returns:
+            tuple: (field columns, rows of field values as FieldTable.decodeBatch() returns them)
+        """
+        for reg in self.registers:
+            if register in (reg['name'], reg['address']):
+                return reg['table'].columns, reg['table'].decodeBatch(values)
+        raise KeyError('Unknown register {}'.format(register))
+    
+    def decodeSnapshots(self, snapshots, chunkSize=1024):
+        """
+        Decode register snapshots, a chunk at a time with decodeBatch()
+        
+        Registers missing from a snapshot keep their current value (the
+        default or one given on the command line), as in a single decode.
+        
+        Args:
+            snapshots: (source, {column: value}) tuples, e.g. from read_snapshots()
+            chunkSize: Snapshots decoded together (default: 1024)
+        
+        Yields:
+            dict: source, passed-through columns, register values, the two
+                  summary lines, then every field with an id, formatted
+        """
+        keys = {}
+        for reg in self.registers:
+            keys[reg['name'].upper()] = keys[reg['address'][2:].upper()] = reg['address']
+        defaults = {reg['address']: int(self._regValues.get(reg['address'], reg['value']), 16) for reg in self.registers}
+        
+        snapshots = iter(snapshots)
+        while True:
+            chunk = list(itertools.islice(snapshots, chunkSize))
+            if not chunk:
+                break
+            
+            extras = []
+            columns = {address: [] for address in defaults}
+            for source, fields in chunk:
+                values = {}
+                other = {}
+                for key, value in fields.items():
+                    k = str(key).strip().upper()
+                    address = keys.get(k[2:] if k.startswith('0X') else k)
+                    if address is None:
+                        other[key] = value
+                    elif value not in ('', None):
+                        try:
+                            values[address] = int(value, 16) if isinstance(value, str) else int(value)
+                        except ValueError:
+                            raise ValueError('{}: bad value {!r} for {}'.format(source, value, key))
+                extras.append((source, other))
+                for address, column in columns.items():
+                    column.append(values.get(address, defaults[address]))
+            
+            spds = [{} for _ in chunk]
+            for reg in self.registers:
+                decoded = reg['table'].decodeBatch(columns[reg['address']])
+                if hasattr(decoded, 'tolist'):
+                    decoded = decoded.tolist()
+                for field, fieldValues in zip(reg['bitFields'], decoded):
+                    field_id = field.get('id')
+                    if field_id:
+                        for spd, fieldValue in zip(spds, fieldValues):
+                            spd[field_id] = format_field(field, fieldValue)
+            
+            for i, ((source, other), spd) in enumerate(zip(extras, spds)):
+                spd_summary(spd)
+                row = {'source': source}
+                row.update(other)
+                for address, column in columns.items():
+                    row[address] = '0x{:08X}'.format(column[i])
+                row['CL-RCD-RP-RAS'] = '-'.join(str(spd.get(k, '?')) for k in SUMMARY[:4])
+                row['RC-RFC-RRD-WR-WTR-RTP'] = '-'.join(str(spd.get(k, '?')) for k in SUMMARY[4:])
+                for k in SUMMARY:
+                    row[k] = spd.get(k, '?')
+                row.update(spd)
+                yield row
+    
+    def getAccess(self):
+        if self.access is None:
+            self.access = open_access(self.accessSpec, self.rwCmd, self.mchbar)
+        return self.access
+    
+    def readAddr(self, address):
+        """Register value as '0x...', OSError when it can't be read"""
+        return '0x{:08X}'.format(self.getAccess().read32(int(address, 16)))
+    
+    def diffRegister(self, reg, old, new):
+        """
+        Fields of a register that differ between two values
+        
+        Returns:
+            list: (id, description, old formatted, new formatted) per changed field
+        """
+        changes = []
+        for field, before, after in zip(reg['bitFields'], reg['table'].decode(old), reg['table'].decode(new)):
+            if before != after:
+                changes.append((field.get('id', ''), field['description'],
+                                format_field(field, before), format_field(field, after)))
+        return changes
+    
+    def watch(self, interval=0.001, duration=None, extra=()):
+        """
+        Sample the registers every interval seconds and print what changed
+        
+        Raw 32-bit words are compared first, only a word that differs is
+        decoded: one line for the word, then one per changed field. Extra
+        registers (offsets without field tables) show the changed bits.
+        
+        Args:
+            interval: Seconds between samples, 0 for as fast as possible (default: 0.001)
+            duration: Stop after this many seconds (default: None, until Ctrl+C)
+            extra: More MCHBAR offsets to watch, as ints (default: ())
+        
+        Returns:
+            tuple: (samples, changed words)
+        """
+        read32 = self.getAccess().read32
+        watched = [(reg['name'], int(reg['address'], 16), reg) for reg in self.registers]
+        watched += [('0x{:X}'.format(offset), offset, None) for offset in extra]
+        offsets = [offset for _, offset, _ in watched]
+        
+        def stamp():
+            return datetime.now().strftime('%H:%M:%S.%f')
+        
+        prev = [read32(offset) for offset in offsets]
+        print("[{}] Watching {} every {}s, Ctrl+C to stop".format(
+            stamp(), ' '.join('{}=0x{:08X}'.format(name, word) for (name, _, _), word in zip(watched, prev)), interval))
+        
+        samples = 1
+        changes = 0
+        started = time.monotonic()
+        due = started
+        try:
+            while duration is None or time.monotonic() - started < duration:
+                if interval:
+                    due += interval
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    elif delay < -interval:
+                        due = time.monotonic()  # Fell behind, don't catch up in a burst
+                
+                words = [read32(offset) for offset in offsets]
+                samples += 1
+                if words == prev:
+                    continue
+                
+                now = stamp()
+                for (name, offset, reg), old, new in zip(watched, prev, words):
+                    if old == new:
+                        continue
+                    changes += 1
+                    print("[{}] {:<6} 0x{:03X}  0x{:08X} -> 0x{:08X}  bits 0x{:08X}".format(now, name, offset, old, new, old ^ new))
+                    if reg is not None:
+                        for field_id, description, before, after in self.diffRegister(reg, old, new):
+                            print("    {:<5} {:>5} -> {:<5} {}".format(field_id, before, after, description))
+                sys.stdout.flush()
+                prev = words
+        except KeyboardInterrupt:
+            pass
+        
+        elapsed = time.monotonic() - started
+        print("[{}] {} samples in {:.1f}s ({:.0f}/s), {} changed words".format(
+            stamp(), samples, elapsed, samples / max(elapsed, 1e-9), changes))
+        return samples, changes
+    
+    def readSnapshot(self):
+        """
+        Current value of every register
+        
+        Returns:
+            dict: {address: value as int}, e.g. {'0x110': 0x87FD1064, ...}
+        """
+        read32 = self.getAccess().read32
+        return {reg['address']: read32(int(reg['address'], 16)) for reg in self.registers}
+
+class TimingEncoder:
+    """
+    Timings to register words, and back: the inverse of the field tables
+    
+    Every named field gets a table of formatted value -> raw bits, built by
+    running its 'format' over all raw values. check() holds a setting
+    against the 'range' and 'min' entries of the tables, search() lists
+    the tightest settings that pass.
+    """
+    def __init__(self, registers=None):
+        self.registers = registers or REGISTERS
+        self.fields = {}  # id -> (register name, field, shift, mask, {formatted value: raw})
+        for name, _, _, bitFields in self.registers:
+            for field, (shift, mask) in zip(bitFields, FieldTable(bitFields).pairs):
+                if field.get('id'):
+                    choices = {}
+                    for raw in range(mask + 1):
+                        choices.setdefault(format_field(field, raw), raw)
+                    choices.pop('?', None)
+                    self.fields[field['id']] = (name, field, shift, mask, choices)
+    
+    def defaults(self):
+        """Default words of all registers, {name: int}"""
+        return {name: int(value, 16) for name, _, value, _ in self.registers}
+    
+    def choices(self, fieldId):
+        """Numeric values a field can be set to, ascending"""
+        return sorted(value for value in self.fields[fieldId][4] if isinstance(value, int))
+    
+    def values(self, words):
+        """Formatted value of every named field, {id: value}"""
+        values = {}
+        for fieldId, (name, field, shift, mask, _) in self.fields.items():
+            values[fieldId] = format_field(field, (words[name] >> shift) & mask)
+        return values
+    
+    def encode(self, targets, words=None):
+        """
+        Set fields to target timings
+        
+        Args:
+            targets: {field id: formatted value}, e.g. {'CL': 3, 'RAS': 6}; other
+                     names (WR, WTR, TA) are formula inputs and are skipped
+            words: Register words to start from, {name: int} (default: defaults())
+        
+        Returns:
+            dict: New register words, {name: int}
+        """
+        words = dict(words or self.defaults())
+        for fieldId, value in targets.items():
+            if fieldId not in self.fields:
+                continue
+            name, field, shift, mask, choices = self.fields[fieldId]
+            raw = choices.get(value)
+            if raw is None:
+                raise ValueError('{}={} cannot be encoded, possible values: {}'.format(
+                    fieldId, value, ' '.join(str(v) for v in self.choices(fieldId))))
+            words[name] = (words[name] & ~(mask << shift)) | (raw << shift)
+        return words
+    
+    def check(self, words, variables=None):
+        """
+        Constraint violations of a setting
+        
+        Args:
+            words: Register words, {name: int}
+            variables: Formula inputs overriding FORMULA_DEFAULTS (default: None)
+        
+        Returns:
+            list: One message per violated 'range' or 'min', empty if valid
+        """
+        env = dict(FORMULA_DEFAULTS)
+        env.update(variables or {})
+        env.update(self.values(words))
+        
+        problems = []
+        for name, _, _, bitFields in self.registers:
+            table = FieldTable(bitFields)
+            for field, fieldValue in zip(bitFields, table.decode(words[name])):
+                label = field.get('id') or field['description']
+                value = format_field(field, fieldValue)
+                field_range = field.get('range')
+                if not isinstance(value, int):
+                    if value == '?':
+                        problems.append('{} {}: reserved encoding {}'.format(name, label, fieldValue))
+                    continue
+                if field_range and not field_range[0] <= value <= field_range[1]:
+                    problems.append('{} {}={} outside {}..{}'.format(name, label, value, field_range[0], field_range[1]))
+                if 'min' in field:
+                    try:
+                        minimum = eval_min(field['min'], env)
+                    except (KeyError, TypeError):
+                        problems.append('{} {}: cannot evaluate min {}'.format(name, label, field['min']))
+                        continue
+                    if value < minimum:
+                        problems.append('{} {}={} below min {} ({})'.format(name, label, value, minimum, field['min']))
+        return problems
+    
+    def search(self, targets, words=None):
+        """
+        Every valid setting with the dependent timings as tight as possible
+        
+        Fields with a 'min' formula that aren't in targets are dependents,
+        set to the smallest value allowed by their formula and range. The
+        named fields their formulas read (RP, RTPC, ...) that aren't in
+        targets are free and enumerated. Formulas only grow with their
+        inputs, so a dependent that is already out of range with the free
+        fields still unset at their smallest values rules out every larger
+        value of the field being enumerated: the search stops there.
+        
+        Args:
+            targets: Fixed timings {name: value}, e.g. {'CL': 3, 'BL': 8}, plus formula inputs
+            words: Register words for everything else (default: defaults())
+        
+        Returns:
+            list: (words, {free field: value}) per setting, tightest first
+        """
+        words = self.encode(targets, words)
+        env = dict(FORMULA_DEFAULTS)
+        env.update({k: v for k, v in targets.items() if k not in self.fields})
+        
+        dependents = [fieldId for fieldId, (_, field, _, _, _) in self.fields.items()
+                      if 'min' in field and fieldId not in targets]
+        free = []
+        for fieldId in dependents:
+            for _, term in MIN_TERM_RE.findall(self.fields[fieldId][1]['min'].replace(' ', '')):
+                for part in term.split('/'):
+                    if part in self.fields and part not in targets and part not in dependents and part not in free:
+                        free.append(part)
+        
+        def tighten(words, values):
+            # Smallest allowed value of every dependent, None if one has none
+            env.update(values)
+            for fieldId in dependents:
+                field = self.fields[fieldId][1]
+                low, high = field.get('range', (None, None))
+                minimum = eval_min(field['min'], env)
+                allowed = [v for v in self.choices(fieldId)
+                           if v >= minimum and (low is None or low <= v <= high)]
+                if not allowed:
+                    return None
+                words = self.encode({fieldId: allowed[0]}, words)
+            return words
+        
+        results = []
+        def walk(i, words, assigned):
+            if i == len(free):
+                tight = tighten(words, self.values(words))
+                if tight is not None:
+                    results.append((tight, dict(assigned)))
+                return
+            fieldId = free[i]
+            for value in self.choices(fieldId):
+                trial = self.encode({fieldId: value}, words)
+                # Lower bound: the free fields after this one at their smallest
+                bound = self.encode({later: self.choices(later)[0] for later in free[i + 1:]}, trial)
+                if tighten(bound, self.values(bound)) is None:
+                    break
+                assigned[fieldId] = value
+                walk(i + 1, trial, assigned)
+            assigned.pop(fieldId, None)
+        
+        walk(0, words, {})
+        return results
+
+def watch_options(argv):
+    """
+    --watch[=OFF,...], --interval and --duration values from the command line
+    
+    Returns:
+        tuple: (interval, duration or None, extra offsets as ints)
+    
+    Raises:
+        ValueError: With a one line message for a bad value
+    """
+    watch = [opt for opt in argv if opt == '--watch' or opt.startswith('--watch=')]
+    extra = []
+    for offset in watch[0].partition('=')[2].split(',') if watch else ():
+        if not offset:
+            continue
+        try:
+            value = int(offset, 16)
+        except ValueError:
+            raise ValueError("--watch: '{}' is not a hex MCHBAR offset".format(offset))
+        if value < 0 or value % 4 or value + 4 > MCHBAR_SIZE:
+            raise ValueError("--watch: offset {} must be 4-byte aligned and below 0x{:X}".format(offset, MCHBAR_SIZE))
+        extra.append(value)
+    
+    options = dict(opt[2:].split('=', 1) for opt in argv if opt.startswith(('--interval=', '--duration=')))
+    seconds = {}
+    for name in ('interval', 'duration'):
+        if name in options:
+            try:
+                seconds[name] = float(options[name])
+            except ValueError:
+                raise ValueError("--{}: '{}' is not a number of seconds".format(name, options[name]))
+            if not 0 <= seconds[name] < float('inf'):
+                raise ValueError("--{}: must be 0 or more seconds, not {}".format(name, options[name]))
+    return seconds.get('interval', 0.001), seconds.get('duration'), extra
+
+def print_timings(encoder, words, variables=None):
+    """Print register words with the summary timings line"""
+    spd = spd_summary(encoder.values(words))
+    spd.update({k: v for k, v in (variables or {}).items() if k in ('WR', 'WTR')})
+    for name, address, _, _ in encoder.registers:
+        print("  {:<7} {}  0x{:08X}".format(name, address, words[name]))
+    print("  {}  (CL-RCD-RP-RAS) / {}  (RC-RFC-RRD-WR-WTR-RTP)".format(
+        '-'.join(str(spd.get(k, '?')) for k in SUMMARY[:4]), '-'.join(str(spd.get(k, '?')) for k in SUMMARY[4:])))
+
+# Timing registers: name, MCHBAR offset, default value (DDR2-400 CL3), bit fields
+REGISTERS = [
+    ("C0DRT0", "0x110", "0x987820C8", [
+        {'bits': '31:28', 'id': 'WTP',  'description': 'Write To Precharge Command Spacing (Same bank)',     'range': [5,13], 'min': 'CL - 1 + BL/2 + WR'},
+        {'bits': '27:24', 'id': 'WTR2', 'description': 'Write To Read Command Spacing (Same rank)',      'range': [4,11], 'min': 'CL - 1 + BL/2 + WTR'},
+        {'bits': '23:22', 'id': 'WRD',  'description': 'Write-Read Command Spacing (Different Rank)',    'format': lambda v: 6-v, 'min': 'BL/2 + TA -1'},
+        {'bits': '21:20', 'id': 'RTW',  'description': 'Read-Write Command Spacing',                    'format': lambda v: 9-v, 'min': 'BL/2 + TA +1'},
+        {'bits': '19:18', 'id': 'CCDw', 'description': 'Write Command Spacing',                         'format': lambda v: 6-v, 'min': 'BL/2 + TA'},
+        {'bits': '16',    'id': 'CCDr', 'description': 'Read Command Spacing',                          'format': lambda v: 5 if v else 6, 'range': [5,6]},
+        {'bits': '15:11', 'id': 'RD',   'description': 'Read Delay',                                   'range': [3,31]},
+        {'bits': '8:4',   'id': 'WTP2', 'description': 'Write Auto precharge to Activate (Same bank)', 'range': [4,19], 'min': 'CL -1 + BL/2 + WR + RP'},
+        {'bits': '3:0',   'id': 'RTP',  'description': 'Read Auto precharge to Activate (Same bank)',  'min': 'RTPC + RP'}
+    ]),
+    
+    ("C0DRT1", "0x114", "0x0290D211", [
+        {'bits': '29:28', 'id': 'RTPC', 'description': 'Read to Pre-charge BL/2', 'format': lambda v: {0:4,1:8}[v]},
+        {'bits': '23:20', 'id': 'RAS',  'description': 'Active to Precharge Delay'},
+        {'bits': '17',    'id': 'RRD',  'description': 'Activate to activate delay (clk)', 'format': lambda v: {0:2,1:3}[v]},
+        {'bits': '16',                  'description': 'tRPALL Pre-All to Activate Delay'},
+        {'bits': '15:11', 'id': 'RFC',  'description': 'Refresh Cycle Time', 'range': [3,31]},
+        {'bits': '9:8',   'id': 'CL',   'description': 'CAS Latency', 'format': lambda v: {0:5,1:4,2:3}[v]},
+        {'bits': '6:4',   'id': 'RCD',  'description': 'RAS to CAS Delay', 'format': lambda v: 1+{0:1,1:2,2:3,3:4,4:5}[v]},
+        {'bits': '2:0',   'id': 'RP',   'description': 'Precharge to Activate Delay', 'format': lambda v: 1+{0:1,1:2,2:3,3:4,4:5}[v]}
+    ]),
+    
+    ("C0DRT2", "0x118", "0x80000230", [
+        {'bits': '31:30', 'description': 'CKE Deassert Duration', 'format': lambda v: {0:1,1:'N/A',2:3,3:'N/A'}[v]},
+        {'bits': '9:8',   'description': 'Power Down Exit to CS# active time', 'id': 'XPDN', 'range': [1,2], 'format': lambda v: {0:'N/A',1:1,2:2,3:1}[v]},
+        {'bits': '7:5',   'description': 'DRAM Page Close Idle Timer', 'format': lambda v: {0:'N/A',1:8,2:16,3:'!res',7:'Inf'}[v]},
+        {'bits': '4:0',   'description': 'DRAM Power down Idle Timer', 'format': lambda v: 'Inf' if v==31 else v, 'range': [8,16]}
+    ]),
+    
+    ("C0DRC0", "0x120", "0x40000906", [
+        {'bits': '29',    'id': 'IC',   'description': 'Initialization Complete', 'format': format_bool},
+        {'bits': '27:24',               'description': 'Active SDRAM Ranks'},
+        {'bits': '15',                  'description': 'CMD copy enable (Single channel only)'},
+        {'bits': '10:8',  'id': 'RMS',  'description': 'Refresh Mode Select (RMS)', 'format': lambda v: {0:'N',1:'15.6',2:'7.8'}.get(v, '')},
+        {'bits': '6:4',   'id': 'SMD',  'description': 'Mode Select'},
+        {'bits': '2',     'id': 'BL',   'description': 'Burst Length', 'format': lambda v: 8 if v else 4},
+        {'bits': '1:0',   'id': 'DT',   'description': 'DRAM Type'}
+    ])
+]
+
+def main():
+    parser = RegisterParser(sys.argv)
+    
+    if '--batch' in sys.argv:
+        # Bulk decode: every snapshot in the listed files to JSON lines / CSV on stdout
+        for name, address, value, bitFields in REGISTERS:
+            parser.addRegister(name, address, value, bitFields)
+        # NNN=VALUE arguments are not files, they replace the defaults of registers missing from a snapshot
+        files = [opt for opt in sys.argv[1:] if not opt.startswith('--') and not REG_VALUE_RE.match(opt)]
+        snapshots = itertools.chain.from_iterable(read_snapshots(path) for path in files)
+        count = write_rows(parser.decodeSnapshots(snapshots), asCsv='--csv' in sys.argv)
+        print("{} snapshots decoded".format(count), file=sys.stderr)
+        return
+    
+    watch = [opt for opt in sys.argv if opt == '--watch' or opt.startswith('--watch=')]
+    if watch:
+        try:
+            interval, duration, extra = watch_options(sys.argv)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+    try:
+        for name, address, value, bitFields in REGISTERS:
+            parser.addRegister(name, address, value, bitFields)
+        
+        if watch:
+            # Change monitor: decoded field diffs only when a register word changes
+            parser.watch(interval, duration, extra)
+            return
+    except OSError as e:
+        print("Cannot read registers via {}: {}".format(parser.accessSpec, e), file=sys.stderr)
+        sys.exit(1)
+    
+    encoder = TimingEncoder()
+    words = {reg['name']: int(parser._regValues.get(reg['address'], reg['value']), 16) for reg in parser.registers}
+    
+    if '--encode' in sys.argv or '--search' in sys.argv:
+        # Timings to register words, starting from the current (default / given / read) words
+        targets = {}
+        for opt in sys.argv[1:]:
+            match = TARGET_RE.match(opt)
+            if match:
+                targets[match.group(1)] = int(match.group(2))
+        variables = {k: v for k, v in targets.items() if k not in encoder.fields}
+        
+        try:
+            if '--search' in sys.argv:
+                results = encoder.search(targets, words)
+                print("Tightest valid settings for {}\n".format(' '.join('{}={}'.format(k, v) for k, v in targets.items())))
+                for found, free in results:
+                    print(' '.join('{}={}'.format(k, v) for k, v in free.items()) or 'setting')
+                    print_timings(encoder, found, variables)
+                    print("  decode: {}\n".format(' '.join('{}={:08X}'.format(address[2:], found[name])
+                                                           for name, address, _, _ in encoder.registers)))
+                print("{} settings".format(len(results)))
+                return
+            
+            words = encoder.encode(targets, words)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        
+        print("Encoded timings\n")
+        print_timings(encoder, words, variables)
+        print()
+        for name, address, _, _ in encoder.registers:
+            print("devmem2 0x{:X} w 0x{:08X}".format(parser.mchbar + int(address, 16), words[name]))
+        problems = encoder.check(words, variables)
+        print("\nConstraint check: {}".format('OK' if not problems else '{} problem(s)'.format(len(problems))))
+        for problem in problems:
+            print("  " + problem)
+        sys.exit(1 if problems else 0)
+    
+    for opt in sys.argv:
+        if opt.startswith('--save-fake='):
+            path = opt.split('=', 1)[1]
+            save_fake_device(path, {int(reg['address'], 16): int(parser._regValues.get(reg['address'], reg['value']), 16)
+                                    for reg in parser.registers})
+            print("Fake MCHBAR device written to {}\n".format(path))
+    
+    print("EEEPC 701/900 DDR2 timings parser\n")
+    parser.parseAndPrint()
+    
+    spd_summary(parser.spd)
+    
+    print("-------------------------------------------------------------------------------------")
+    print("@ 200 MHz\t{}-{}-{}-{:<2}  (CL-RCD-RP-RAS) / {:<2}-{}-{}-{}-{}-{}  (RC-RFC-RRD-WR-WTR-RTP) \n".format(
+        parser.spd['CL'],
+        parser.spd['RCD'],
+        parser.spd['RP'],
+        parser.spd['RAS'],
+        parser.spd['RC'],
+        parser.spd['RFC'],
+        parser.spd['RRD'],
+        parser.spd['WR'],
+        parser.spd['WTR'],
+        parser.spd['RTP']
+    ))
+    
+    print("SPD Memory Timings")
+    print("HYMP125S64CP8-S6")
+    print("@ 400 MHz\t6-6-6-18  (CL-RCD-RP-RAS) / 24-51-3-6-3-3  (RC-RFC-RRD-WR-WTR-RTP)")
+    print("@ 333 MHz\t5-5-5-15  (CL-RCD-RP-RAS) / 20-43-3-5-3-3  (RC-RFC-RRD-WR-WTR-RTP)")
+    print("@ 266 MHz\t4-4-4-12  (CL-RCD-RP-RAS) / 16-34-2-4-2-2  (RC-RFC-RRD-WR-WTR-RTP)")
+    print("HYMP125S64CP8-Y5")
+    print("@ 200 MHz\t3-3-3-9   (CL-RCD-RP-RAS) / 12-26-2-3-2-2  (RC-RFC-RRD-WR-WTR-RTP)")
+    
+    if '--check' in sys.argv:
+        # Current timings against the 'range' / 'min' entries of the field tables
+        problems = encoder.check(words)
+        print("\nConstraint check: {}".format('OK' if not problems else '{} problem(s)'.format(len(problems))))
+        for problem in problems:
+            print("  " + problem)
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,329 @@
+"""
+EEEPC 701/900 EC Monitor benchmarks
+
+Micro-benchmarks for the hot paths, with a stored baseline to catch slowdowns:
+
+- EC_Parser.parse_line, one case per line pattern (CPUTmp header + value,
+  inline CPUTmp, hex lead, oXX,o echo, REC=, CFan idx,PWM inline and split,
+  plain chatter), the real traffic in output.txt and a synthetic flood from
+  ec_simulator.py
+- EC_Parser.create_temperature_gauge
+- RegisterParser.extractBitField / printRegister / decodeBatch from
+  mchbar_timings.py (decodeBatch with NumPy when it is installed), and
+  readSnapshot from a fake MCHBAR device file (the /dev/mem mmap code path)
+
+Every case reports the best time per operation out of --repeat runs, so
+background load only ever makes a run look slower, never faster. The baseline
+is a JSON file (ec_bench.json next to this script by default); --compare
+fails (exit code 1) when a case got slower than the baseline by more than
+--tolerance, and stays that slow when measured --retries more times.
+Baselines are only comparable on the same machine and Python, so none is
+shipped: record your own with --save before changing the code, then
+--compare after.
+
+# Required:
+
+pip install pyserial (imported by ec_monitor.py, no port is opened)
+
+# Usage:
+
+python ec_bench.py                          # Run and print
+python ec_bench.py --save                   # Run and store as the baseline (do this first)
+python ec_bench.py --compare                # Run and check against the baseline
+python ec_bench.py --compare --tolerance=0.25 --filter=parse
+
+
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import timeit
+import tempfile
+import random
+import platform
+import itertools
+import contextlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'dram_timings', 'scripts'))
+
+from ec_monitor import EC_Parser, CAPTURE_PREFIX_RE
+from ec_simulator import TrafficGenerator
+import mchbar_timings
+
+BASELINE = os.path.join(HERE, 'ec_bench.json')
+CAPTURE = os.path.join(HERE, '..', 'output.txt')
+
+# One line (or header + value pair) per parse_line() pattern
+PARSE_CASES = {
+    'parse cputmp header+value': ["CPUTmp", "3C"],
+    'parse inline cputmp': ["37,T(A0,S0)wTTTCPUTmp"],
+    'parse hex lead': ["37,T(A0,S0)TTwT"],
+    'parse echo cputmp': ["o39,o,T(A0,S0)wTTTCPUTmp"],
+    'parse rec': ["REC=3A,D3,"],
+    'parse cfan inline': ["03,3C,CFan idx,PWM"],
+    'parse cfan split': ["36,CFan idx,PWM", "04,46"],
+    'parse chatter': ["e80,dD3,"],
+}
+
+FLOOD_LINES = 20000
+BATCH_VALUES = 10000
+
+def quiet_parser():
+    """EC_Parser as used for a --skip-raw replay, without a serial port"""
+    return EC_Parser(None, skip_raw=True)
+
+def capture_lines(path):
+    """Lines of a saved capture, prefix stripped and decoded as replay() does"""
+    with open(path, 'rb') as capture:
+        return [CAPTURE_PREFIX_RE.sub(b'', raw_line, count=1).decode('ascii', errors='ignore')
+                for raw_line in capture]
+
+def parse_all(parser, lines):
+    """Benchmark body: parse every line in order"""
+    parse_line = parser.parse_line
+    def run():
+        for line in lines:
+            parse_line(line)
+    return run
+
+def bench_cases(workdir, capture=CAPTURE):
+    """
+    Build the benchmark cases
+
+    Args:
+        workdir: Directory for the fake MCHBAR device file, kept while the cases run
+
+    Returns:
+        list: (name, function, operations per call) tuples
+    """
+    cases = []
+
+    for name, lines in PARSE_CASES.items():
+        cases.append((name, parse_all(quiet_parser(), lines), len(lines)))
+
+    if os.path.exists(capture):
+        lines = capture_lines(capture)
+        cases.append(('parse output.txt', parse_all(quiet_parser(), lines), len(lines)))
+
+    flood = [line.decode() + '\r\n' for line in
+             itertools.islice(TrafficGenerator(seed=1).lines(), FLOOD_LINES)]
+    cases.append(('parse synthetic flood', parse_all(quiet_parser(), flood), len(flood)))
+
+    gauge_parser = quiet_parser()
+    temps = list(range(35, 86))
+    def gauge():
+        create = gauge_parser.create_temperature_gauge
+        for temp in temps:
+            create(temp)
+    cases.append(('gauge', gauge, len(temps)))
+
+    registers = mchbar_timings.REGISTERS
+    register_parser = mchbar_timings.RegisterParser([])
+    fields = [(int(value, 16), field['bits']) for _, _, value, bit_fields in registers for field in bit_fields]
+    def extract():
+        extract_bit_field = register_parser.extractBitField
+        for value, bits in fields:
+            extract_bit_field(value, bits)
+    cases.append(('mchbar extractBitField', extract, len(fields)))
+
+    # Registers as the script prints them, with their compiled field table
+    for name, address, value, bit_fields in registers:
+        register_parser.addRegister(name, address, value, bit_fields)
+    def print_registers():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for register in register_parser.registers:
+                register_parser.printRegister(register)
+    cases.append(('mchbar printRegister', print_registers, len(register_parser.registers)))
+
+    rnd = random.Random(1)
+    snapshots = [rnd.getrandbits(32) for _ in range(BATCH_VALUES)]
+    def decode_batch():
+        for name, _, _, _ in registers:
+            register_parser.decodeBatch(name, snapshots)
+    cases.append(('mchbar decodeBatch', decode_batch, len(registers) * len(snapshots)))
+
+    fake = os.path.join(workdir, 'mchbar.bin')
+    mchbar_timings.save_fake_device(fake, {int(address, 16): int(value, 16) for _, address, value, _ in registers})
+    register_parser.accessSpec = fake
+    cases.append(('mchbar readSnapshot', register_parser.readSnapshot, 1))
+
+    return cases
+
+def measure(func, repeat=5, min_time=0.2):
+    """
+    Best time of one call to func
+
+    The number of calls per run is calibrated so a run takes at least min_time.
+
+    Returns:
+        float: Seconds per call, best of repeat runs
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    elapsed = timer.timeit(number)
+    if elapsed < min_time:
+        number = max(number, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat, number)) / number
+
+def run(cases, repeat=5, min_time=0.2):
+    """
+    Run the benchmarks, printing one row per case
+
+    Args:
+        cases: Case name -> (function, operations per call)
+
+    Returns:
+        dict: Case name -> nanoseconds per operation
+    """
+    results = {}
+    print(f"{'Case':<32} {'ns/op':>12} {'ops/s':>14}")
+    print("-"*60)
+    for name, (func, ops) in cases.items():
+        ns = measure(func, repeat, min_time) / ops * 1e9
+        results[name] = round(ns, 1)
+        print(f"{name:<32} {ns:>12.1f} {1e9 / ns:>14,.0f}")
+    return results
+
+def over_tolerance(baseline, results, tolerance=0.2):
+    """Names of the cases slower than the baseline by more than tolerance"""
+    stored = baseline.get('results', {})
+    return [name for name, ns in results.items() if stored.get(name) and ns / stored[name] - 1 > tolerance]
+
+def environment():
+    """Where the numbers came from, stored with the baseline"""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'node': platform.node(),
+        'numpy': mchbar_timings.numpy.__version__ if mchbar_timings.numpy is not None else None,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def save_baseline(path, results):
+    """Write results as the new baseline, keeping cases that weren't run this time"""
+    baseline = load_baseline(path) if os.path.exists(path) else {'results': {}}
+    baseline['results'].update(results)
+    baseline['environment'] = environment()
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"Baseline saved to {path}")
+
+def load_baseline(path):
+    """Read a baseline written by save_baseline()"""
+    with open(path) as f:
+        return json.load(f)
+
+def compare(baseline, results, tolerance=0.2):
+    """
+    Print results against the baseline
+
+    Args:
+        baseline: Dict loaded by load_baseline()
+        results: Case name -> nanoseconds per operation
+        tolerance: Allowed slowdown, 0.2 = 20% (default: 0.2)
+
+    Returns:
+        list: Names of the cases slower than the baseline by more than tolerance
+    """
+    stored = baseline.get('results', {})
+    env = baseline.get('environment', {})
+    print(f"\nBaseline: Python {env.get('python', '?')} on {env.get('node', '?')}, {env.get('date', '?')}")
+    if (env.get('python') != platform.python_version() or env.get('node') != platform.node()
+            or env.get('numpy') != environment()['numpy']):
+        print("Warning: baseline comes from a different machine, Python or NumPy, expect differences")
+    print(f"{'Case':<32} {'baseline':>12} {'now':>12} {'change':>8}")
+    print("-"*70)
+
+    slower = over_tolerance(baseline, results, tolerance)
+    for name, ns in results.items():
+        before = stored.get(name)
+        if not before:
+            print(f"{name:<32} {'-':>12} {ns:>12.1f} {'new':>8}")
+            continue
+        change = ns / before - 1
+        verdict = "  SLOWER" if name in slower else ""
+        print(f"{name:<32} {before:>12.1f} {ns:>12.1f} {change:>+8.1%}{verdict}")
+
+    print("-"*70)
+    if slower:
+        print(f"{len(slower)} case(s) slower than the baseline by more than {tolerance:.0%}")
+    else:
+        print(f"No case slower than the baseline by more than {tolerance:.0%}")
+    return slower
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark the EC monitor and register decoder hot paths against a stored baseline',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s                                   # Run and print
+  %(prog)s --save                            # Store the results as the baseline
+  %(prog)s --compare --tolerance=0.25        # Exit code 1 if a case got >25%% slower
+  %(prog)s --filter=mchbar --repeat=10       # Only the register decoder cases
+        """
+    )
+    parser.add_argument('--baseline', type=str, default=BASELINE, metavar='FILE',
+                       help='Baseline JSON file (default: ec_bench.json next to this script)')
+    parser.add_argument('--save', action='store_true',
+                       help='Store the results as the baseline')
+    parser.add_argument('--compare', action='store_true',
+                       help='Compare the results with the baseline, exit code 1 on slowdowns')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                       help='Allowed slowdown before a case is flagged, 0.2 = 20%% (default: 0.2)')
+    parser.add_argument('--filter', type=str, metavar='TEXT',
+                       help='Only run cases whose name contains TEXT')
+    parser.add_argument('--repeat', type=int, default=5,
+                       help='Runs per case, the best one counts (default: 5)')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                       help='Shortest run in seconds (default: 0.2)')
+    parser.add_argument('--retries', type=int, default=2,
+                       help='Times a case slower than the baseline is measured again before it counts (default: 2)')
+
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}, create one with --save")
+            sys.exit(2)
+        baseline = load_baseline(args.baseline)
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='ec_bench') as workdir:
+            cases = {name: (func, ops) for name, func, ops in bench_cases(workdir)
+                     if not args.filter or args.filter in name}
+            results = run(cases, args.repeat, args.min_time)
+
+            # A noisy moment makes a case look slower, a real slowdown stays on every try
+            for _ in range(args.retries if baseline is not None else 0):
+                flagged = over_tolerance(baseline, results, args.tolerance)
+                if not flagged:
+                    break
+                print(f"\nMeasuring {len(flagged)} case(s) slower than the baseline again")
+                retried = run({name: cases[name] for name in flagged}, args.repeat, args.min_time)
+                results.update({name: min(results[name], ns) for name, ns in retried.items()})
+    except KeyboardInterrupt:
+        print("\nBenchmark stopped by user")
+        sys.exit(130)
+
+    slower = compare(baseline, results, args.tolerance) if baseline is not None else []
+    if args.save:
+        save_baseline(args.baseline, results)
+    if slower:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
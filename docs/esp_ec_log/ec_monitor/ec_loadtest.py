@@ -0,0 +1,202 @@
+"""
+EEEPC 701/900 EC Monitor load test
+
+Runs ec_monitor.py against the ec_simulator.py pseudo-terminal at rising
+line rates and reports the highest rate it sustains without dropping or
+falling behind.
+
+- Every trial starts a fresh monitor with --metrics-port and reads its
+  ec_lines_received_total counter, so nothing is measured from the monitor's output
+- A trial passes when the simulator kept the target rate and the monitor
+  counted every line within --grace seconds after the last one was sent
+- Rates double until a trial fails, then bisect between the last pass and the first failure
+- Lag has the 1s resolution of the metrics endpoint
+
+# Required:
+
+Linux (or any OS with pseudo-terminals), pip install pyserial
+
+# Usage:
+
+python ec_loadtest.py
+python ec_loadtest.py --start=1000 --duration=5 --monitor-args="--events"
+python ec_loadtest.py --baudrate=0 --monitor-args="--show-raw"   # No UART limit, full output path
+
+
+"""
+
+import os
+import re
+import sys
+import time
+import socket
+import subprocess
+import urllib.request
+
+from ec_simulator import TrafficGenerator, PtyBridge
+
+MONITOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ec_monitor.py')
+
+TOTAL_LINES_RE = re.compile(r'^ec_lines_received_total\{[^}]*\} (\d+)$', re.M)
+
+def free_port():
+    """Pick an unused local TCP port for the monitor's metrics endpoint"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def scrape_total(port):
+    """Lines the monitor has counted so far, None while its endpoint is not up"""
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=1) as response:
+            match = TOTAL_LINES_RE.search(response.read().decode())
+    except OSError:
+        return None
+    return int(match.group(1)) if match else 0
+
+def run_trial(rate, duration=3.0, baudrate=115200, grace=1.0, monitor_args=(), replay=None, seed=1):
+    """
+    Send rate lines/s for duration seconds to a fresh monitor
+
+    Returns:
+        dict: rate, sent, sent_rate, received, lag (seconds until all lines
+              were counted, None if they never were), ok, and uart_limited
+              when the emulated baud rate couldn't carry the target rate
+    """
+    bridge = PtyBridge(baudrate)
+    metrics_port = free_port()
+    monitor = subprocess.Popen(
+        [sys.executable, MONITOR, '--port', bridge.port, '--baudrate', str(baudrate or 115200),
+         '--metrics-port', str(metrics_port), *monitor_args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    try:
+        # Wait for the monitor to open the port and serve metrics
+        deadline = time.monotonic() + 10
+        while scrape_total(metrics_port) is None:
+            if monitor.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"ec_monitor.py did not start (exit code {monitor.poll()})")
+            time.sleep(0.1)
+
+        lines = TrafficGenerator(replay, seed).lines()
+        sent, _, elapsed = bridge.send(lines, rate, duration=duration)
+        finished = time.monotonic()
+
+        # Metrics are republished once a second, so poll past the grace period by that much
+        received = 0
+        lag = None
+        while time.monotonic() - finished < grace + 1.5:
+            received = scrape_total(metrics_port) or received
+            if received >= sent:
+                lag = time.monotonic() - finished
+                break
+            time.sleep(0.05)
+    finally:
+        monitor.terminate()
+        monitor.wait()
+        bridge.close()
+
+    sent_rate = sent / max(elapsed, 1e-6)
+    kept_up = lag is not None and lag <= grace + 1.0
+    uart_limited = sent_rate < rate * 0.95
+    return {'rate': rate, 'sent': sent, 'sent_rate': sent_rate, 'received': received, 'lag': lag,
+            'ok': kept_up and not uart_limited, 'uart_limited': kept_up and uart_limited}
+
+def print_trial(result):
+    """Print one trial row"""
+    lag = f"{result['lag']:6.2f}s" if result['lag'] is not None else "  never"
+    verdict = "ok" if result['ok'] else "UART limit" if result['uart_limited'] else "FAIL"
+    print(f"{result['rate']:>10.0f} {result['sent_rate']:>10.0f} {result['sent']:>9} "
+          f"{result['received']:>9} {result['sent'] - result['received']:>7} {lag:>8}  {verdict}")
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Find the highest EC line rate ec_monitor.py sustains without drops',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s                                   # Default monitor options (raw chatter shown)
+  %(prog)s --monitor-args="--skip-raw"       # Quiet monitor
+  %(prog)s --baudrate=0 --max-rate=500000    # Beyond what a real UART can deliver
+        """
+    )
+    parser.add_argument('--start', type=float, default=500,
+                       help='First line rate to try, lines/s (default: 500)')
+    parser.add_argument('--max-rate', type=float, default=200000,
+                       help='Highest line rate to try, lines/s (default: 200000)')
+    parser.add_argument('--duration', type=float, default=3.0,
+                       help='Seconds of traffic per trial (default: 3)')
+    parser.add_argument('--grace', type=float, default=1.0,
+                       help='Seconds the monitor may lag behind after the last line (default: 1)')
+    parser.add_argument('--steps', type=int, default=4,
+                       help='Bisection steps after the first failure (default: 4)')
+    parser.add_argument('--baudrate', '-b', type=int, default=115200,
+                       help='Emulated serial speed, 0 for unlimited (default: 115200)')
+    parser.add_argument('--replay', type=str, metavar='FILE',
+                       help='Loop a saved capture instead of synthetic traffic')
+    parser.add_argument('--monitor-args', type=str, default='',
+                       help='Extra ec_monitor.py options, e.g. "--skip-raw --events"')
+
+    args = parser.parse_args()
+    monitor_args = args.monitor_args.split()
+
+    if args.baudrate:
+        print(f"UART limit at {args.baudrate} baud: {args.baudrate // 10} bytes/s")
+    print(f"Monitor: ec_monitor.py {' '.join(monitor_args)}")
+    print(f"{'Target/s':>10} {'Sent/s':>10} {'Sent':>9} {'Received':>9} {'Missing':>7} {'Lag':>8}  Result")
+    print("-"*72)
+
+    def trial(rate):
+        result = run_trial(rate, args.duration, args.baudrate, args.grace, monitor_args, args.replay)
+        print_trial(result)
+        return result
+
+    best = None
+    failed = None
+    uart_rate = None
+    rate = args.start
+    try:
+        # Double until the monitor (or the emulated UART) can't keep up
+        while rate <= args.max_rate:
+            result = trial(rate)
+            if result['uart_limited']:
+                # The monitor kept up with everything the serial line can carry
+                uart_rate = result['sent_rate']
+                break
+            if not result['ok']:
+                failed = rate
+                break
+            best = rate
+            rate *= 2
+
+        # Narrow down between the last pass and the first failure
+        if best is not None and failed is not None:
+            low, high = best, failed
+            for _ in range(args.steps):
+                middle = (low + high) / 2
+                if trial(middle)['ok']:
+                    low = middle
+                else:
+                    high = middle
+            best = low
+    except KeyboardInterrupt:
+        print("\nLoad test stopped by user")
+
+    print("-"*72)
+    if uart_rate is not None:
+        print(f"Kept up with the full {args.baudrate} baud line, about {uart_rate:.0f} lines/s "
+              f"(use --baudrate=0 to find the monitor's own limit)")
+    elif best is None:
+        print(f"No sustained rate found, even {args.start:.0f} lines/s failed")
+    elif failed is None:
+        print(f"Sustained every rate up to {best:.0f} lines/s")
+    else:
+        print(f"Highest sustained rate: {best:.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
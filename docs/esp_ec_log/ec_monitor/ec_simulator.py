@@ -0,0 +1,245 @@
+"""
+EEEPC 701/900 EC traffic simulator
+
+Stand-in for the ESP8266 serial bridge: opens a Linux pseudo-terminal and
+writes KB3310 style debug chatter to it, so ec_monitor.py can be run and
+load-tested without hardware.
+
+- Synthetic traffic: CPUTmp readings, CFan idx,PWM updates, REC=/WEC=
+  register access and the occasional boot burst, or
+- Replay of a saved capture (Arduino serial monitor log, e.g. output.txt)
+- Paced by line rate and by serial baud rate (10 bits per byte), whichever is slower
+
+# Required:
+
+Linux (or any OS with pseudo-terminals), Python 3 only
+
+# Usage:
+
+# Start the simulator, it prints the port to monitor
+python ec_simulator.py --rate=50
+python ec_monitor.py --port=/dev/pts/3 --skip-raw
+
+# Replay a capture in a loop at 9600 baud
+python ec_simulator.py --replay=../output.txt --rate=1000 --baudrate=9600
+
+# Send 10000 lines as fast as 115200 baud allows, then exit
+python ec_simulator.py --rate=0 --count=10000
+
+
+"""
+
+import os
+import re
+import time
+import tty
+import random
+import itertools
+
+# Arduino serial monitor timestamp prefix in saved captures: "17:10:05.302 -> "
+CAPTURE_PREFIX_RE = re.compile(rb'^\d{1,2}:\d{2}:\d{2}\.\d{3} -> ')
+
+# Boot / power button burst, as seen in output.txt
+BOOT_BURST = [
+    b">>> EC Init >>>",
+    b"wTT(A0,S5)TTTT(A0,S5)wTTTT(A0,S5)TTwTT(A0,S5)",
+    b"TPWRBTN",
+    b"03,04,04,04,04,04,05,ACin",
+    b",".join([b"A0"] * 4 + [b"A1"] * 12 + [b"A2"] * 30) + b",PWR-ON",
+    b"LIDon",
+    b"eE3,o01,o,",
+    b"eE1,d01,",
+    b"wECFlag idx,dat,org",
+    b"03,00,20,",
+    b"ECFlg=",
+    b"1D,Flag_SMI",
+    b"IAA,O55,",
+    b"I60,D65,O,TCFan idx,PWM",
+    b"00,00,w",
+    b"eA3,d01,>IDLE",
+]
+
+class TrafficGenerator:
+    """
+    Endless source of EC lines (bytes, without line ending)
+
+    Synthetic traffic follows a slow CPU temperature random walk with the EC
+    fan table reacting to it, interleaved with register access chatter.
+    """
+    def __init__(self, replay=None, seed=None, boot_every=2000):
+        """
+        Args:
+            replay: Capture file to loop instead of synthetic traffic (default: None)
+            seed: Random seed for reproducible synthetic traffic (default: None)
+            boot_every: Average lines between boot bursts, 0 disables them (default: 2000)
+        """
+        self.replay = replay
+        self.random = random.Random(seed)
+        self.boot_every = boot_every
+        self.temp = 55
+        self.fan_mode = 2
+        self.fan_pwm = 0x32
+
+    def lines(self):
+        """Iterate over lines forever"""
+        if self.replay:
+            with open(self.replay, 'rb') as capture:
+                recorded = [CAPTURE_PREFIX_RE.sub(b'', line.rstrip(b'\r\n')) for line in capture]
+            return itertools.cycle(recorded)
+        return self.synthetic()
+
+    def synthetic(self):
+        """Generate KB3310 style chatter"""
+        rnd = self.random
+        while True:
+            # Temperature drifts by a degree now and then, stays in the EC's usual range
+            self.temp = max(40, min(80, self.temp + rnd.choice((-1, 0, 0, 0, 1))))
+            temp = self.temp
+
+            # CPUTmp header, the reading follows on the next line
+            yield b"CPUTmp"
+            yield f"{temp:02X},T(A0,S0)wTTTCPUTmp".encode()
+
+            # Fan table: mode and PWM follow the temperature
+            mode = 0 if temp < 50 else 1 if temp < 60 else 2 if temp < 70 else 3
+            if mode != self.fan_mode:
+                self.fan_mode = mode
+                self.fan_pwm = (0x00, 0x28, 0x3C, 0x50)[mode]
+                yield f"{temp:02X},CFan idx,PWM".encode()
+                yield f"{mode:02X},{self.fan_pwm:02X},T(A0,S0)".encode()
+
+            roll = rnd.random()
+            if roll < 0.3:
+                # Register read
+                yield b"e80,dD3,"
+                yield f"REC={temp:02X},D3,".encode()
+                yield f"o{temp:02X},o,".encode()
+            elif roll < 0.4:
+                # Register write
+                yield b"e81,dD3,d20,"
+                yield b"WEC=20,D3,"
+            elif roll < 0.5:
+                yield b"eB4,d07,d01,"
+
+            if self.boot_every and rnd.random() < 4 / self.boot_every:
+                yield from BOOT_BURST
+
+class PtyBridge:
+    """
+    Pseudo-terminal standing in for the serial bridge. Writes are paced by
+    line rate and by the time the bytes would take on a real UART.
+    """
+    def __init__(self, baudrate=115200, newline=b"\r\n"):
+        self.baudrate = baudrate
+        self.newline = newline
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+    def close(self):
+        """Close both ends of the pseudo-terminal"""
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def send(self, lines, rate=100, count=None, duration=None, tick=0.002):
+        """
+        Write lines to the pty
+
+        Lines that are due are written together once per tick, so high rates
+        don't cost one system call and one sleep per line.
+
+        Args:
+            lines: Iterator of lines (bytes, without line ending)
+            rate: Lines per second, 0 for as fast as the baud rate allows (default: 100)
+            count: Stop after this many lines (default: None, no limit)
+            duration: Stop after this many seconds (default: None, no limit)
+            tick: Write interval in seconds (default: 0.002)
+
+        Returns:
+            tuple: (lines sent, bytes sent, seconds)
+        """
+        byte_time = 10 / self.baudrate if self.baudrate else 0  # 8N1: start + 8 data + stop bits
+        line_time = 1 / rate if rate else 0
+        sent = sent_bytes = 0
+        started = time.monotonic()
+        due = started  # When the next line may start
+
+        while (count is None or sent < count) and (duration is None or due - started < duration):
+            now = time.monotonic()
+            if due > now:
+                time.sleep(min(due - now, tick))
+                continue
+
+            # Everything due by now (plus one tick ahead) goes out in one write
+            chunk = []
+            horizon = now + tick
+            while due <= horizon and (count is None or sent < count):
+                line = next(lines) + self.newline
+                chunk.append(line)
+                sent += 1
+                sent_bytes += len(line)
+                due += max(line_time, len(line) * byte_time)
+            data = memoryview(b"".join(chunk))
+            while data:
+                data = data[os.write(self.master, data):]
+
+            # Fell behind (the reader side is full): don't try to catch up in one burst
+            if time.monotonic() - due > 1:
+                due = time.monotonic()
+
+        return sent, sent_bytes, time.monotonic() - started
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='ENE KB3310 EC traffic simulator on a pseudo-terminal',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s --rate=50                   # Synthetic traffic, 50 lines/s
+  %(prog)s --replay=../output.txt      # Loop a saved capture
+  %(prog)s --rate=0 --count=10000      # 10000 lines at full 115200 baud speed
+        """
+    )
+    parser.add_argument('--rate', type=float, default=50,
+                       help='Lines per second, 0 for as fast as the baud rate allows (default: 50)')
+    parser.add_argument('--baudrate', '-b', type=int, default=115200,
+                       help='Emulated serial speed, 0 for unlimited (default: 115200)')
+    parser.add_argument('--replay', type=str, metavar='FILE',
+                       help='Loop a saved capture (e.g., output.txt) instead of synthetic traffic')
+    parser.add_argument('--count', type=int,
+                       help='Exit after sending this many lines')
+    parser.add_argument('--duration', type=float,
+                       help='Exit after this many seconds')
+    parser.add_argument('--seed', type=int,
+                       help='Random seed for reproducible synthetic traffic')
+    parser.add_argument('--boot-every', type=int, default=2000,
+                       help='Average lines between boot bursts in synthetic traffic, 0 to disable (default: 2000)')
+
+    args = parser.parse_args()
+
+    generator = TrafficGenerator(args.replay, args.seed, args.boot_every)
+    bridge = PtyBridge(args.baudrate)
+    print(f"EC simulator on {bridge.port}")
+    print(f"Run: python ec_monitor.py --port={bridge.port}")
+    print("Starting in 2s, press Ctrl+C to exit")
+
+    try:
+        time.sleep(2)  # Time to start the monitor
+        sent, sent_bytes, elapsed = bridge.send(generator.lines(), args.rate, args.count, args.duration)
+        print(f"Sent {sent} lines ({sent_bytes} bytes) in {elapsed:.2f}s, {sent / max(elapsed, 1e-6):.0f} lines/s")
+    except KeyboardInterrupt:
+        print("\nSimulator stopped by user")
+    finally:
+        bridge.close()
+
+
+if __name__ == "__main__":
+    main()